@@ -1,19 +1,36 @@
 #!/usr/bin/env python
 
+import os
+import sys
 import time
-import datetime
+import queue
+import threading
+import math
 import qwiic_scd4x
 import numpy as np
-from collections import deque
-import csv
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional, without it the helpers just run as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
 
 
 def main(lunchbox_volume, leaf_area_cm2, window_size, ofname,
-         force_recalibrate, save_to_file=False):
+         force_recalibrate, save_to_file=False, fixed_cadence=False,
+         quiet=False):
 
-    DEG_2_K = 273.15
+    WRITE_BATCH = 16  # rows
+    WRITE_INTERVAL = 30.0  # s
     leaf_area_m2 = leaf_area_cm2 / 10000.0
 
+    # the box volume and leaf area never change, so build the A_net
+    # conversion for them once
+    anet_area_fn = make_anet_area(lunchbox_volume, leaf_area_m2)
+
     sensor = qwiic_scd4x.QwiicSCD4x()
     if not sensor.is_connected():
         print("Sensor not connected")
@@ -36,71 +53,232 @@ def main(lunchbox_volume, leaf_area_cm2, window_size, ofname,
         print("** Performing manual calibration to 420 ppm... **")
         result = sensor.perform_forced_recalibration(420)
 
+    # compile the numba helpers now rather than on the first sample
+    anet_area_fn(0.0, 25.0)
+    calc_vpd(25.0, 50.0)
+    clamp(50.0, 0.0, 100.0)
+    _slope_from_sums(2, 1.0, 1.0, 1.0, 1.0)
+
     print("Starting measurements...")
 
-    co2_window = deque(maxlen=window_size)
-    time_window = deque(maxlen=window_size)
+    window = RollingSlope(window_size, fixed_cadence=fixed_cadence)
 
+    # rows are fixed-schema numbers, so we buffer them in a block, format
+    # them ourselves and write them out in batches rather than going through
+    # csv.writer per row
+    block = np.empty((WRITE_BATCH, 5))  # time, co2, temp, rh, a_net
+    nrows = 0
     if save_to_file:
-        f = open(ofname, "w", newline="")
-        writer = csv.writer(f)
-        writer.writerow(["time", "co2", "temp", "rh", "vpd", "a_net"])
+        fd = os.open(ofname, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.write(fd, b"time,co2,temp,rh,vpd,a_net\n")
+        last_write = time.time()
     else:
-        f = None
-        writer = None
+        fd = None
+
+    # I²C reads happen on a producer thread so the regression, printing and
+    # logging below overlap with waiting on the sensor
+    readings = queue.Queue(maxsize=1)
+    stop = threading.Event()
+    reader = threading.Thread(target=read_sensor,
+                              args=(sensor, readings, stop, quiet), daemon=True)
+    reader.start()
 
     try:
         while True:
-            if sensor.read_measurement():
-                co2 = sensor.get_co2()
-                if co2 <= 0. or np.isnan(co2):
-                    print("Invalid CO₂ reading, skipping...")
-                    continue
+            t_ns, now, co2, temp, rh = readings.get()
+            if co2 <= 0. or math.isnan(co2):
+                print("Invalid CO₂ reading, skipping...")
+                continue
 
-                temp = sensor.get_temperature()
-                if temp < -40 or temp > 60:
-                    print("Temperature out of range, skipping...")
-                    continue
+            if temp < -40 or temp > 60:
+                print("Temperature out of range, skipping...")
+                continue
 
-                rh = max(0, min(100, sensor.get_humidity()))
-                vpd = calc_vpd(temp, rh)
-                now_iso = datetime.datetime.now().isoformat()
+            rh = clamp(rh, 0.0, 100.0)
+            window.append(t_ns, co2)
 
-                co2_window.append(co2)
-                time_window.append(time.time())
-
-                print(
+            # build the status lines up and send them in one write
+            if not quiet:
+                status = (
                     f"CO₂: {co2:.1f} μmol mol⁻¹ | Temp: {temp:.1f} °C | "
-                    f"RH: {rh:.1f} % | VPD: {vpd:.2f} kPa"
+                    f"RH: {rh:.1f} % | VPD: {calc_vpd(temp, rh):.2f} kPa\n"
                 )
 
-                if len(co2_window) >= window_size:
-                    times = np.array(time_window)
-                    co2s = np.array(co2_window)
-                    slope, _ = np.polyfit(times - times[0], co2s, 1) # ppm/s
-                    temp_k = temp + DEG_2_K
-                    anet_leaf = calc_anet(slope, lunchbox_volume, temp_k)
-                    anet_area = -anet_leaf / leaf_area_m2  # umol m-2 s-1
+            if window.is_full():
+                slope = window.slope() # ppm/s
+                anet_area = anet_area_fn(slope, temp)
 
-                    print(
+                if not quiet:
+                    status += (
                         f"ΔCO₂: {slope:+.3f} μmol mol⁻¹ s⁻¹ | "
-                        f"A_net: {anet_area:+.2f} μmol m⁻² s⁻¹"
+                        f"A_net: {anet_area:+.2f} μmol m⁻² s⁻¹\n"
+                        f"{'-' * 40}\n"
                     )
-                    print("-" * 40)
 
-                    if save_to_file:
-                        writer.writerow([now_iso, f"{co2:.3f}", f"{temp:.3f}",
-                                         f"{rh:.3f}", f"{vpd:.3f}",
-                                         f"{anet_area:.3f}"])
-                        f.flush()
+                if save_to_file:
+                    block[nrows] = (now, co2, temp, rh, anet_area)
+                    nrows += 1
+                    if (nrows == WRITE_BATCH or
+                        now - last_write >= WRITE_INTERVAL):
+                        write_rows(fd, format_rows(block[:nrows]))
+                        nrows = 0
+                        last_write = now
 
-                    time.sleep(6.0)
-            else:
-                print(".", end="", flush=True)
-                time.sleep(0.5)
+            if not quiet:
+                sys.stdout.write(status)
 
     except KeyboardInterrupt:
         print("\nStopping measurements.")
+    finally:
+        stop.set()
+        if save_to_file:
+            if nrows:
+                write_rows(fd, format_rows(block[:nrows]))
+            os.close(fd)
+
+def read_sensor(sensor, readings, stop, quiet=False):
+    # Producer: poll the sensor and pass each fresh reading to main(). The
+    # SCD4x only has a new measurement every 5 s, so after a reading sleep
+    # until the next one is nearly due and only poll from there
+    SENSOR_PERIOD = 5.0  # s
+    SENSOR_POLL = 0.5  # s
+
+    while not stop.is_set():
+        if sensor.read_measurement():
+            # monotonic clock for the regression (immune to NTP steps),
+            # wall clock only for the CSV time column
+            readings.put((time.monotonic_ns(), time.time(), sensor.get_co2(),
+                          sensor.get_temperature(), sensor.get_humidity()))
+            stop.wait(SENSOR_PERIOD - SENSOR_POLL)
+        else:
+            if not quiet:
+                os.write(1, b".")
+            stop.wait(SENSOR_POLL)
+
+def format_rows(block):
+    # VPD for the whole block in one go, then one encoded CSV line per row
+    vpd = calc_vpd_batch(block[:, 2], block[:, 3])
+
+    return [
+        f"{iso_timestamp(t)},{co2:.3f},"
+        f"{temp:.3f},{rh:.3f},{v:.3f},{anet:.3f}\n".encode()
+        for (t, co2, temp, rh, anet), v in zip(block, vpd)
+    ]
+
+# last minute formatted by iso_timestamp and its "YYYY-MM-DDTHH:MM:" prefix
+_iso_minute = None
+_iso_prefix = ""
+
+def iso_timestamp(ts):
+    # Local-time ISO 8601 string for a time.time() stamp, as
+    # datetime.fromtimestamp(ts).isoformat() would give. Readings arrive every
+    # few seconds, so the date-to-minute prefix is reused until the minute
+    # rolls over and only the seconds are formatted on each call
+    global _iso_minute, _iso_prefix
+
+    minute, usec = divmod(round(ts * 1e6), 60_000_000)
+    if minute != _iso_minute:
+        _iso_minute = minute
+        _iso_prefix = time.strftime("%Y-%m-%dT%H:%M:",
+                                    time.localtime(minute * 60))
+
+    return f"{_iso_prefix}{usec // 1000000:02d}.{usec % 1000000:06d}"
+
+def write_rows(fd, rows):
+    # hand the whole batch of encoded rows to the kernel in one syscall
+    if hasattr(os, "writev"):
+        written = os.writev(fd, rows)
+    else:
+        written = 0
+
+    # a pipe, a full disk or a signal can leave a short write, so write
+    # whatever is left rather than silently dropping rows
+    if written < sum(map(len, rows)):
+        rest = memoryview(b"".join(rows))[written:]
+        while rest:
+            rest = rest[os.write(fd, rest):]
+
+class RollingSlope:
+    # Least-squares slope over the last `size` samples. Rather than refitting
+    # the whole window every sample, we keep running sums of x, y, xx and xy
+    # and swap the outgoing sample for the incoming one, i.e. O(1) per update.
+    #
+    # If samples arrive at a fixed cadence the design matrix Z = [1, i] is the
+    # same for every window, so the slope row of pinv(Z) can be computed once
+    # and the fit becomes a single dot product, scaled by the mean time step
+
+    def __init__(self, size, fixed_cadence=False):
+        self.size = size
+        self.fixed_cadence = fixed_cadence
+        self.x = np.empty(size)
+        self.y = np.empty(size)
+        self.i = 0
+        self.count = 0
+        self.t0_ns = None
+        self.s_x = 0.0
+        self.s_y = 0.0
+        self.s_xx = 0.0
+        self.s_xy = 0.0
+
+        if fixed_cadence:
+            z = np.vstack([np.ones(size), np.arange(size)]).T
+            slope_row = np.linalg.pinv(z)[1]
+            # one row per ring position, so the oldest sample at self.i
+            # lines up with the first coefficient
+            self.slope_rows = np.array([np.roll(slope_row, i)
+                                        for i in range(size)])
+
+    def append(self, t_ns, co2):
+        # t_ns is an integer time.monotonic_ns() stamp; store seconds since
+        # the first sample to keep the sums small
+        if self.t0_ns is None:
+            self.t0_ns = t_ns
+        x = (t_ns - self.t0_ns) * 1e-9
+
+        if self.count == self.size:
+            x_old = self.x[self.i]
+            y_old = self.y[self.i]
+            self.s_x -= x_old
+            self.s_y -= y_old
+            self.s_xx -= x_old * x_old
+            self.s_xy -= x_old * y_old
+        else:
+            self.count += 1
+
+        self.s_x += x
+        self.s_y += co2
+        self.s_xx += x * x
+        self.s_xy += x * co2
+        self.x[self.i] = x
+        self.y[self.i] = co2
+        self.i = (self.i + 1) % self.size
+
+        # re-sum once per lap so rounding errors can't accumulate
+        if self.i == 0:
+            self.s_x = self.x.sum()
+            self.s_y = self.y.sum()
+            self.s_xx = (self.x * self.x).sum()
+            self.s_xy = (self.x * self.y).sum()
+
+    def is_full(self):
+        return self.count == self.size
+
+    def slope(self):
+        if self.fixed_cadence:
+            x_first = self.x[self.i]
+            x_last = self.x[self.i - 1]
+            mean_dt = (x_last - x_first) / (self.size - 1)
+            return (self.slope_rows[self.i] @ self.y) / mean_dt  # ppm s-1
+
+        return _slope_from_sums(self.count, self.s_x, self.s_y, self.s_xx,
+                                self.s_xy)  # ppm s-1
+
+@njit(cache=True, fastmath=True)
+def _slope_from_sums(n, s_x, s_y, s_xx, s_xy):
+    num = n * s_xy - s_x * s_y
+    den = n * s_xx - s_x * s_x
+
+    return num / den
 
 def calc_volume_litres(width_cm, height_cm, length_cm):
 
@@ -108,6 +286,12 @@ def calc_volume_litres(width_cm, height_cm, length_cm):
     volume_litres = volume_cm3 / 1000
     return volume_litres
 
+@njit(cache=True, fastmath=True)
+def clamp(x, lo, hi):
+    # compiles to branchless min/max instructions under numba
+    return min(hi, max(lo, x))
+
+@njit(cache=True, fastmath=True)
 def calc_anet(delta_ppm_s, lunchbox_volume, temp_k):
     # Net assimilation rate (An_leaf, umol leaf-1 s-1) calculated using the
     # ideal gas law to solve for "n" amount of substance, moles of gas
@@ -131,19 +315,48 @@ def calc_anet(delta_ppm_s, lunchbox_volume, temp_k):
 
     return an_leaf  # umol leaf s-1
 
+def make_anet_area(lunchbox_volume, leaf_area_m2):
+    # Build calc_anet specialised for this run: returns A_net on a leaf area
+    # basis with the sign flipped (uptake positive). numba treats the
+    # closed-over values as literals, so they are folded in when the
+    # function (and its call into calc_anet) compiles
+    deg_2_k = 273.15
+    area_scale = -1.0 / leaf_area_m2
+
+    @njit(fastmath=True)
+    def anet_area(delta_ppm_s, temp_c):
+        return area_scale * calc_anet(delta_ppm_s, lunchbox_volume,
+                                      temp_c + deg_2_k)
+
+    return anet_area  # umol m-2 s-1
+
+@njit(cache=True, fastmath=True)
 def calc_vpd(temp_c, rh_percent):
     es = saturation_vapour_pressure(temp_c) # kPa
-    ea = es * (rh_percent / 100.0) # kPa
 
-    return es - ea  # kPa
+    # es - ea, with ea = es * rh / 100, written as a multiply by 0.01
+    return es * (100.0 - rh_percent) * 0.01  # kPa
+
+@njit(cache=True, fastmath=True)
+def calc_vpd_batch(temp_c, rh_percent):
+    # calc_vpd over arrays of readings, with a single np.exp call; the
+    # Tetens coefficients are picked per element for temp above/below 0 deg C.
+    # Under numba the element-wise expressions fuse into one loop
+    above = temp_c >= 0.0
+    a = np.where(above, 17.27, 21.875)
+    b = np.where(above, 237.3, 265.5)
+    es = 0.61078 * np.exp((a * temp_c) / (temp_c + b)) # kPa
+
+    return es * (100.0 - rh_percent) * 0.01  # kPa
 
+@njit(cache=True, fastmath=True)
 def saturation_vapour_pressure(temp_c):
     if temp_c >= 0.0:
         # Monteith and Unsworth (2008) - Tetens' formula for temp > 0 deg C
-        p = 0.61078 * np.exp((17.27 * temp_c) / (temp_c + 237.3)) # kPa
+        p = 0.61078 * math.exp((17.27 * temp_c) / (temp_c + 237.3)) # kPa
     else:
         # Murray (1967) Tetens' formula for temp < 0 deg C
-        p = 0.61078 * np.exp((21.875 * temp_c) / (temp_c + 265.5)) # kPa
+        p = 0.61078 * math.exp((21.875 * temp_c) / (temp_c + 265.5)) # kPa
 
     return p
 
@@ -161,6 +374,10 @@ if __name__ == "__main__":
                         help='Turn off volume correction for plant in pot')
     parser.add_argument('--save', action='store_true',
                         help='Save logged data to CSV file')
+    parser.add_argument('--fixed_cadence', action='store_true',
+                        help='Assume evenly spaced samples when fitting slope')
+    parser.add_argument('--quiet', action='store_true',
+                        help='Do not print each reading to the terminal')
     args = parser.parse_args()
 
     # correct lunchbox volume for plant in pot?
@@ -174,4 +391,5 @@ if __name__ == "__main__":
     window_size = 12
     ofname = "../outputs/photosynthesis_log.csv"
     main(lunchbox_volume, la, window_size, ofname, args.recalibrate,
-         save_to_file=args.save)
+         save_to_file=args.save, fixed_cadence=args.fixed_cadence,
+         quiet=args.quiet)
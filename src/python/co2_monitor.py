@@ -1,8 +1,10 @@
 #!/usr/bin/env python
 
 import time
+import threading
 import qwiic_scd4x
 import matplotlib.pyplot as plt
+import matplotlib.animation as animation
 from collections import deque
 
 
@@ -34,51 +36,71 @@ def main(force_recalibrate):
     print("Reading data from SCD40 sensor...\n")
 
     start_time = time.time()
+    co2_data = deque(maxlen=300)
+    time_data = deque(maxlen=300)
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    # The sensor is polled on its own thread so that redrawing the figure
+    # never holds up sampling; the plot just picks up whatever has arrived
+    reader = threading.Thread(target=read_sensor,
+                              args=(sensor, start_time, co2_data, time_data,
+                                    lock, stop),
+                              daemon=True)
+    reader.start()
 
     # Set up plot
-    plt.ion()
     fig, ax = plt.subplots()
-    co2_data = deque(maxlen=300)
-    time_data = deque(maxlen=300)
     line, = ax.plot([], [])
     ax.set_xlabel("Time (min)")
     ax.set_ylabel("CO₂ (μmol mol⁻¹)")
     ax.grid(True)
 
-    try:
-        while True:
-            if sensor.read_measurement():
-                co2 = sensor.get_co2()
-                temp = sensor.get_temperature()
-                rh = sensor.get_humidity()
+    def update(frame):
+        with lock:
+            xs = list(time_data)
+            ys = list(co2_data)
 
-                t_now = (time.time() - start_time) / 60.0  # minutes
-                co2_data.append(co2)
-                time_data.append(t_now)
-
-                # Print live
-                print(
-                    f"[{int(t_now):02d}:{int((t_now % 1)*60):02d}] "
-                    f"CO₂: {co2:.1f} μmol mol⁻¹ | "
-                    f"Temp: {temp:.1f} °C | RH: {rh:.1f} %"
-                )
+        line.set_data(xs, ys)
+        ax.relim()
+        ax.autoscale_view()
 
-                # Update plot
-                line.set_xdata(time_data)
-                line.set_ydata(co2_data)
-                ax.relim()
-                ax.autoscale_view()
-                plt.pause(0.01)
+        return line,
 
-                time.sleep(2)
-            else:
-                time.sleep(0.2)
+    ani = animation.FuncAnimation(fig, update, interval=10_000,
+                                  cache_frame_data=False)
 
+    try:
+        plt.show()
     except KeyboardInterrupt:
-        print("\nExiting sensor reader.")
+        pass
     finally:
-        plt.ioff()
-        plt.show()
+        stop.set()
+        print("\nExiting sensor reader.")
+
+def read_sensor(sensor, start_time, co2_data, time_data, lock, stop):
+
+    while not stop.is_set():
+        if sensor.read_measurement():
+            co2 = sensor.get_co2()
+            temp = sensor.get_temperature()
+            rh = sensor.get_humidity()
+
+            t_now = (time.time() - start_time) / 60.0  # minutes
+            with lock:
+                co2_data.append(co2)
+                time_data.append(t_now)
+
+            # Print live
+            print(
+                f"[{int(t_now):02d}:{int((t_now % 1)*60):02d}] "
+                f"CO₂: {co2:.1f} μmol mol⁻¹ | "
+                f"Temp: {temp:.1f} °C | RH: {rh:.1f} %"
+            )
+
+            stop.wait(2)
+        else:
+            stop.wait(0.2)
 
 if __name__ == "__main__":
 
@@ -1,7 +1,5 @@
 import time
-from collections import deque
 import numpy as np
-import statsmodels.api as sm
 from scipy.signal import savgol_filter, butter, filtfilt, medfilt
 
 from xensiv_pas_co2_sensor import CO2Sensor
@@ -24,9 +22,11 @@ class LunchboxLogger:
         self.smoothing = smoothing
         self.rolling_regression = rolling_regression
 
-        # Data buffers
-        self.co2_window = deque(maxlen=window_size)
-        self.time_window = deque(maxlen=window_size)
+        # Data buffers, oldest sample first so the fit can work on them in
+        # place rather than copying a deque into a new array every update
+        self.co2_window = np.empty(window_size)
+        self.time_window = np.empty(window_size)
+        self.n_window = 0
         self.last_co2 = None
 
         # Setup sensor
@@ -92,14 +92,20 @@ class LunchboxLogger:
                 return None
 
         self.last_measure_time = current_time
-        self.co2_window.append(co2)
-        self.time_window.append(current_time)
-
-        if len(self.co2_window) < self.window_size:
+        if self.n_window == self.window_size:
+            # drop the oldest sample, a window_size memmove
+            self.co2_window[:-1] = self.co2_window[1:]
+            self.time_window[:-1] = self.time_window[1:]
+            self.n_window -= 1
+        self.co2_window[self.n_window] = co2
+        self.time_window[self.n_window] = current_time
+        self.n_window += 1
+
+        if self.n_window < self.window_size:
             return None
 
-        co2_array = np.array(self.co2_window)
-        time_array = np.array(self.time_window)
+        co2_array = self.co2_window
+        time_array = self.time_window
         elapsed = time_array - time_array[0]
         elapsed = np.round(elapsed, 2)
         elapsed -= elapsed.mean()
@@ -119,6 +125,9 @@ class LunchboxLogger:
 
         # Rolling linear regression
         if self.rolling_regression:
+            # statsmodels is slow to import and only needed for the robust
+            # fit, so don't load it unless that's been asked for
+            import statsmodels.api as sm
             X = sm.add_constant(elapsed)
             #model = sm.OLS(co2_array_filter, X)
 
@@ -128,13 +137,17 @@ class LunchboxLogger:
             slope = results.params[1]
             stderr = results.bse[1] if results.bse.size > 1 else 0
         else:
-            (p, residuals, _, _, _) = np.polyfit(elapsed, co2_array_filter, 1,
-                                                 full=True)
-            slope = p[0]
+            # elapsed is already centred on its mean, so the least-squares
+            # slope is just Sxy / Sxx and the residual sum of squares
+            # follows from the same sums, no need for polyfit's lstsq
             n = len(elapsed)
-            if n > 2 and residuals.size > 0:
-                residual_var = residuals[0] / (n - 2)
-                x_var = np.var(elapsed, ddof=1)
+            y = co2_array_filter - co2_array_filter.mean()
+            sxx = elapsed @ elapsed
+            sxy = elapsed @ y
+            slope = sxy / sxx
+            if n > 2:
+                residual_var = max(y @ y - slope * sxy, 0.0) / (n - 2)
+                x_var = sxx / (n - 1)
                 stderr = np.sqrt(residual_var / (n * x_var))
             else:
                 stderr = 0
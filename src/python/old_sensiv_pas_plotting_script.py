@@ -47,7 +47,6 @@ class LunchboxLogger:
         self.ys_anet_upper = deque(maxlen=self.max_len)
         self.co2_window = deque(maxlen=window_size)
         self.time_window = deque(maxlen=window_size)
-        self.anet_fill = None
         self.last_co2 = None
 
         # Setup sensor
@@ -71,6 +70,14 @@ class LunchboxLogger:
 
         self.line_anet, = self.ax_anet.plot([], [], lw=2, color="#28b463", \
                             label="Anet")
+        # one CI envelope for the whole run, update() just reshapes it
+        self.anet_fill = self.ax_anet.fill_between([], [], [],
+                                                   color='#0b5345', alpha=0.2,
+                                                   label='95% CI')
+        lines = [self.line_anet, self.anet_fill]
+        labels = [line.get_label() for line in lines\
+                        if line.get_label() != '_nolegend_']
+        self.ax_anet.legend(lines, labels, loc="lower right")
         self.co2_text = self.ax_anet.text(
                             0.02, 0.95, "", transform=self.ax_anet.transAxes,
                             fontsize=12, verticalalignment='top',
@@ -224,19 +231,20 @@ class LunchboxLogger:
                     # Calculate standard error of slope for 95% CI
                     stderr = results.bse[1] if results.bse.size > 1 else 0
                 else:
-
-                    (p, residuals, rank,
-                     singular_values,
-                     rcond) = np.polyfit(elapsed, co2_array_filter, 1,
-                                         full=True)
-
-                    slope = p[0]
-                    intercept = p[1]
-
+                    # elapsed is already centred on its mean, so the
+                    # least-squares slope is just Sxy / Sxx and the residual
+                    # sum of squares follows from the same sums, no need for
+                    # polyfit's lstsq
                     n = len(elapsed)
-                    if n > 2 and residuals.size > 0:
-                        residual_var = residuals[0] / (n - 2)
-                        x_var = np.var(elapsed, ddof=1)
+                    intercept = co2_array_filter.mean()
+                    y = co2_array_filter - intercept
+                    sxx = elapsed @ elapsed
+                    sxy = elapsed @ y
+                    slope = sxy / sxx
+
+                    if n > 2:
+                        residual_var = max(y @ y - slope * sxy, 0.0) / (n - 2)
+                        x_var = sxx / (n - 1)
                         stderr = np.sqrt(residual_var / (n * x_var))
                     else:
                         stderr = 0
@@ -320,25 +328,15 @@ class LunchboxLogger:
                 # Update plot with smoothed Anet
                 #self.line_anet.set_data(self.xs, anet_smooth)
 
-                # Remove previous envelope if it exists
-                if self.anet_fill is not None:
-                    self.anet_fill.remove()
-
-                # Fill between the raw upper and lower bounds (no smoothing)
-                self.anet_fill = self.ax_anet.fill_between(
-                    list(self.xs),
-                    list(self.ys_anet_lower),
-                    list(self.ys_anet_upper),
-                    color='#0b5345',
-                    alpha=0.2,
-                    label='95% CI'
-                )
-
-                # Update legend
-                lines = [self.line_anet, self.anet_fill]
-                labels = [line.get_label() for line in lines\
-                                if line.get_label() != '_nolegend_']
-                self.ax_anet.legend(lines, labels, loc="lower right")
+                # Envelope between the raw upper and lower bounds (no
+                # smoothing), reshaping the existing polygon rather than
+                # removing it and building a new fill_between
+                x = np.asarray(self.xs)
+                lower = np.asarray(self.ys_anet_lower)
+                upper = np.asarray(self.ys_anet_upper)
+                verts = np.column_stack([np.concatenate([x, x[::-1]]),
+                                         np.concatenate([lower, upper[::-1]])])
+                self.anet_fill.set_verts([verts])
 
         return self.line_anet, self.co2_text, self.anet_fill
 
@@ -1,23 +1,47 @@
 #!/usr/bin/env python
 
 import sys
+import math
 import time
 import threading
-import qwiic_scd4x
-import numpy as np
 from collections import deque
+import numpy as np
 import matplotlib
-matplotlib.use("TkAgg")
+try:
+    # QtAgg when a Qt binding is installed, otherwise stick with Tk
+    import matplotlib.backends.backend_qtagg
+    matplotlib.use("QtAgg")
+except ImportError:
+    matplotlib.use("TkAgg")
 import matplotlib.pyplot as plt
-from matplotlib.widgets import Button, TextBox, CheckButtons
-from scipy.stats import linregress
+from matplotlib.widgets import Button, TextBox
+from matplotlib.colors import to_rgba
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional, without it the helpers just run as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# column layout of LunchboxLogger.ring
+RING_TIME, RING_CO2, RING_CO2_DRY, RING_TEMP, RING_RH = range(5)
 
+# row layout of LunchboxLogger.anet_ring
+ANET_TIME, ANET_VALUE, ANET_UPPER, ANET_LOWER, ANET_TEMP, ANET_RH = range(6)
+
+# the SCD4x gives a new reading every 5 s in periodic mode, after a reading
+# we sleep until the next is due, then poll until it is ready
+SENSOR_PERIOD = 5.0 # s
+SENSOR_POLL = 0.25 # s
 
 class LunchboxLogger:
 
     def __init__(self, lunchbox_volume, window_size, plot_window,
                  zero_run_duration, leaf_area_cm2_init,
-                 no_dry_correction):
+                 no_dry_correction, quiet=False):
 
         self.lunchbox_volume = lunchbox_volume
         self.window_size = window_size
@@ -25,250 +49,214 @@ class LunchboxLogger:
         self.pressure_pa = 101325.
         self.zero_run_duration = zero_run_duration
         self.leaf_area_cm2 = [leaf_area_cm2_init]
-        self.logging_started = False
+        self.leaf_area_m2 = leaf_area_cm2_init / 10000.0
+        # _calc_anet is p * V * slope / (R * T), and p and V are fixed for
+        # the run. Evaluating it with slope = 1 and T = 1 gives the per-unit
+        # factor p * V / R (not a flux at 1 K), so A_net = slope *
+        # _flux_const / T
+        self._flux_const = _calc_anet(1.0, 1.0, lunchbox_volume,
+                                      self.pressure_pa)
+        self.logging_started = threading.Event()
         self.zero_run_started = False
-        self.stop_requested = False
+        self.stop_requested = threading.Event()
+        self._sensor_version = 0
+        self._dirty = False
+        # status text set by the sensor thread, applied by the GUI tick
+        self._pending_status = None
+        self._last_sample_time = 0.0
         self.zero_slope = 0.0
-        self.co2_window = np.full(window_size, np.nan)
-        self.time_window = np.full(window_size, np.nan)
-        self.temp_values = np.full(window_size, np.nan)
-        self.rh_values = np.full(window_size, np.nan)
+        # one row per sample: time (s since logging started, as used in
+        # the fit), wet CO2, dry CO2, temp, RH, the fit itself runs off the
+        # running sums below
+        self.ring = np.full((window_size, 5), np.nan)
         self.window_index = 0
         self.window_filled = False
-        self.anet_times = deque()
-        self.anet_values = deque()
-        self.anet_upper = deque()
-        self.anet_lower = deque()
-        self.zero_data_times = []
-        self.zero_data_co2 = []
+        # one A_net point per sensor sample (every SENSOR_PERIOD s at the
+        # fastest), oldest first, sized to hold a full plot_window plus a
+        # few spare so once full the oldest drops off on append and the
+        # plot trims to plot_window exactly. Written by the sensor thread,
+        # under the lock
+        # One row per quantity so every series is a contiguous slice, and
+        # float32 as this is only ever plotted
+        max_samples = int(self.plot_window / SENSOR_PERIOD) + 4
+        self.anet_ring = np.empty((6, max_samples), dtype=np.float32)
+        self.anet_count = 0
+        self._ymin_running = np.inf
+        self._ymax_running = -np.inf
         self.start_time = None
         self.lock = threading.Lock()
         self._setup_sensor()
         self._setup_plot()
         self.zero_status_dots = 0
-        self.dry_co2_window = np.full(window_size, np.nan)
         self.last_anet_print_time = 0
         self.no_dry_correction = no_dry_correction
+        self.quiet = quiet
+        # running sums for the window fit (t in s since logging started, y
+        # the CO2 column being fitted), updated as samples go in and out of
+        # the ring so the slope is O(1) per sample
+        self._y_col = RING_CO2 if no_dry_correction else RING_CO2_DRY
+        self._t0 = None
+        self._n = 0
+        self._s_t = self._s_tt = self._s_y = self._s_ty = self._s_yy = 0.0
+        self._reset_zero_sums()
         self._last_zero_print = 0
+        self._last_log_print = 0
+        # lines from the sensor thread, written out by the GUI timer so a
+        # slow terminal never holds up a sensor read
+        self._log_lines = deque(maxlen=256)
 
     def run(self):
 
-        DEG_2_K = 273.15
-
         thread = threading.Thread(target=self.sensor_thread, daemon=True)
         thread.start()
 
+        # a backend timer (a QTimer under QtAgg) drives the updates from
+        # inside the GUI's own event loop, rather than us re-entering it
+        # with a pause/sleep loop
+        self._last_seen = self._sensor_version
+        self._timer = self.fig.canvas.new_timer(interval=500)
+        self._timer.add_callback(self._on_tick)
+        self._timer.start()
         try:
-            while not self.stop_requested:
-                plt.pause(0.05)
-                with self.lock:
-                    manual_temp = self.manual_temp_c
-                    logging = self.logging_started
-                    zero_run = self.zero_run_started
-                    co2_data = (self.co2_window.copy(),
-                                self.time_window.copy(),
-                                self.temp_values.copy(),
-                                self.rh_values.copy(),
-                                self.window_filled,
-                                self.window_index)
-                    anet_times = list(self.anet_times)
-                    anet_values = list(self.anet_values)
-                    anet_upper = list(self.anet_upper)
-                    anet_lower = list(self.anet_lower)
-                    zero_slope = self.zero_slope
-                    leaf_area_m2 = self.leaf_area_cm2[0] / 10000.0
-
-                if zero_run:
-                    continue
-
-                if logging:
-                    (co2_window, time_window, temp_vals,
-                     rh_vals, filled, idx) = co2_data
-
-                    if filled:
-                        times = time_window
-                        if self.no_dry_correction:
-                            co2s = co2_window
-                        else:
-                            co2s = self.dry_co2_window
-                        temps = temp_vals
-                        rhs = rh_vals
-                    else:
-                        times = time_window[:idx]
-                        if self.no_dry_correction:
-                            co2s = co2_window[:idx]
-                        else:
-                            co2s = self.dry_co2_window[:idx]
-                        temps = temp_vals[:idx]
-                        rhs = rh_vals[:idx]
-
-                    valid_mask = (~np.isnan(times)) & (~np.isnan(co2s))
-                    times = times[valid_mask]
-                    co2s = co2s[valid_mask]
-
-                    if len(co2s) >= self.window_size:
-                        res = linregress(times - times[0], co2s)
-                        slope = res.slope
-                        stderr = res.stderr or 0.0
-
-                        corr_slope = slope - zero_slope
-                        slope_upper = corr_slope + 1.96 * stderr
-                        slope_lower = corr_slope - 1.96 * stderr
-
-                        if len(temps) > 0:
-                            temp_K = temps[-1] + DEG_2_K
-                        else:
-                            temp_K = 298.15  # 25 deg
-
-                        an_leaf = self.calc_anet(corr_slope, temp_K,
-                                                 self.lunchbox_volume,
-                                                 self.pressure_pa)
-                        an_leaf_u = self.calc_anet(slope_upper, temp_K,
-                                                   self.lunchbox_volume,
-                                                   self.pressure_pa)
-                        an_leaf_l = self.calc_anet(slope_lower, temp_K,
-                                                   self.lunchbox_volume,
-                                                   self.pressure_pa)
-
-                        A_net = -an_leaf / leaf_area_m2
-                        A_net_u = -an_leaf_u / leaf_area_m2
-                        A_net_l = -an_leaf_l / leaf_area_m2
-
-                        now = time.time()
-                        if now - self.last_anet_print_time > 5:
-                            print(
-                                f"ΔCO₂: {corr_slope:+.4f} ± {1.96*stderr:.4f} | "
-                                f"A_net: {A_net:+.2f}"
-                            )
-                            print("-" * 40)
-                            self.last_anet_print_time = now
-
-
-
-                        now = time.time()
-                        with self.lock:
-                            self.anet_times.append(now)
-                            self.anet_values.append(A_net)
-                            self.anet_upper.append(A_net_u)
-                            self.anet_lower.append(A_net_l)
-
-                            while (self.anet_times and
-                                   (now - self.anet_times[0]) > \
-                                    self.plot_window):
-                                self.anet_times.popleft()
-                                self.anet_values.popleft()
-                                self.anet_upper.popleft()
-                                self.anet_lower.popleft()
-
-                        times_rel = [(t - self.anet_times[0]) / 60
-                                     for t in self.anet_times]
-                        self.line.set_xdata(times_rel)
-                        self.line.set_ydata(self.anet_values)
-
-                        if self.ci_fill:
-                            self.ci_fill.remove()
-
-                        self.ci_fill = self.ax.fill_between(
-                            times_rel,
-                            list(self.anet_lower),
-                            list(self.anet_upper),
-                            color='seagreen', alpha=0.3)
-
-                        min_len = min(len(self.anet_times),
-                                      len(temps), len(rhs))
-                        if min_len > 0:
-                            temp_times_rel = [(t - self.anet_times[0]) / 60 \
-                                    for t in list(self.anet_times)[-min_len:]]
-
-                            self.temp_line.set_xdata(temp_times_rel)
-                            self.temp_line.set_ydata(list(temps)[-min_len:])
-
-                            self.rh_line.set_xdata(temp_times_rel)
-                            self.rh_line.set_ydata(list(rhs)[-min_len:])
-                        else:
-                            self.temp_line.set_xdata([])
-                            self.temp_line.set_ydata([])
-                            self.rh_line.set_xdata([])
-                            self.rh_line.set_ydata([])
-
-                        #self.ax.relim()
-                        #self.ax.autoscale_view()
-                        y_vals = list(self.anet_values)
-                        if y_vals:
-                            y_min_cap = -5.0
-                            y_max_cap = 20
-                            y_min_data = min(y_vals)
-                            y_min = max(y_min_data - 1, y_min_cap)
-                            y_max_data = max(y_vals)
-                            y_max = min(y_max_data + 1, y_max_cap)
-                            self.ax.set_ylim(y_min, y_max)
-
-                        self.ax2.relim()
-                        self.ax2.autoscale_view()
-
-                        if not self.ci_filled_once:
-                            lines = [self.line, self.temp_line, self.rh_line]
-                            labels = [line.get_label() for line in lines]
-                            self.ax.legend(lines, labels, loc='upper left')
-                            self.ci_filled_once = True
-
-                        plt.draw()
+            plt.show()
         except KeyboardInterrupt:
             print("\nInterrupted by user.")
         finally:
-            plt.ioff()
-            plt.show()
+            # let the sensor thread finish any I2C read in progress rather
+            # than killing it mid-transaction at interpreter exit
+            self._timer.stop()
+            self.stop_requested.set()
+            thread.join(timeout=1.0)
+            self._flush_log()
             print("Exited cleanly.")
 
+    def _on_tick(self):
+
+        self._flush_log()
+
+        # matplotlib is only touched from the GUI thread, so the sensor
+        # thread leaves its status text here for us to apply
+        if self._pending_status is not None:
+            with self.lock:
+                status, self._pending_status = self._pending_status, None
+            self.status_text.set_text(status)
+            self._dirty = True
+
+        # status text changes since the last tick, one repaint covers them
+        if self._dirty:
+            self._dirty = False
+            self.fig.canvas.draw_idle()
+
+        # stop button pressed, leave the final plot up until the window is
+        # closed
+        if self.stop_requested.is_set():
+            self._timer.stop()
+            return
+
+        # only redraw when the sensor thread has stored a new A_net point
+        # (~5 s)
+        if self._sensor_version == self._last_seen:
+            return
+
+        with self.lock:
+            self._last_seen = self._sensor_version
+            n_anet = self.anet_count
+            ring = self.anet_ring
+            # the size bound isn't exact, drop anything older than
+            # plot_window here, the times are in order so a binary search
+            # finds the first one to keep
+            first = np.searchsorted(ring[ANET_TIME, :n_anet],
+                                    ring[ANET_TIME, n_anet - 1] -
+                                    self.plot_window / 60.0)
+            # the sensor thread shifts the ring as it appends, so plot
+            # from a copy of the visible part
+            hist = ring[:, first:n_anet].copy()
+            y_min_data = self._ymin_running
+            y_max_data = self._ymax_running
+
+        anet_t = hist[ANET_TIME]
+        anet_v = hist[ANET_VALUE]
+        anet_u = hist[ANET_UPPER]
+        anet_l = hist[ANET_LOWER]
+        temps = hist[ANET_TEMP]
+        rhs = hist[ANET_RH]
+
+        times_rel = anet_t - anet_t[0]
+        self.line.set_data(times_rel, anet_v)
+
+        # reshape the existing CI polygon rather than removing it and
+        # building a new fill_between
+        verts = np.column_stack([
+            np.concatenate([times_rel, times_rel[::-1]]),
+            np.concatenate([anet_l, anet_u[::-1]])])
+        self.ci_fill.set_verts([verts])
+
+        # temp/RH are stored with each A_net point, so they share its time
+        # axis and history
+        self.temp_line.set_data(times_rel, temps)
+        self.rh_line.set_data(times_rel, rhs)
+
+        # limits are rounded out to whole units so they only move (and force
+        # a full redraw) now and then, the rest of the time we just blit the
+        # data artists
+        x_max = max(np.ceil(times_rel[-1]), 1.0)
+        y_min_cap = -5.0
+        y_max_cap = 20
+        y_min = max(np.floor(y_min_data) - 1, y_min_cap)
+        y_max = min(np.ceil(y_max_data) + 1, y_max_cap)
+        y2_min = 5 * np.floor(min(temps.min(), rhs.min()) / 5)
+        y2_max = 5 * np.ceil(max(temps.max(), rhs.max()) / 5)
+
+        redraw = self._bg is None
+        limits = (x_max, y_min, y_max, y2_min, y2_max)
+        if limits != self._limits:
+            self._limits = limits
+            self.ax.set_xlim(0, x_max)
+            self.ax.set_ylim(y_min, y_max)
+            self.ax2.set_ylim(y2_min, y2_max)
+            redraw = True
+
+        if not self.ci_filled_once:
+            lines = [self.line, self.temp_line, self.rh_line]
+            labels = [line.get_label() for line in lines]
+            self.ax.legend(lines, labels, loc='upper left')
+            self.ci_filled_once = True
+            redraw = True
+
+        if redraw:
+            # queue a full redraw, coalesced with any status text change,
+            # _on_draw then picks up the new background and draws the data
+            self.fig.canvas.draw_idle()
+        else:
+            self.fig.canvas.restore_region(self._bg)
+            self._draw_data_artists()
+            self.fig.canvas.blit(self.ax.bbox)
+
+    # The gas law and humidity helpers are numba-compiled module functions
+    # (numba can't compile staticmethods), these just keep the old class
+    # API working
+
     @staticmethod
     def calc_anet(delta_ppm_s, temp_K, lunchbox_volume, pressure_pa):
-        # Net assimilation rate (An_leaf, umol leaf-1 s-1) calculated using the
-        # ideal gas law to solve for "n" amount of substance, moles of gas
-        # i.e, converts ppm s-1 into umol s-1
-        #
-        #            delta_CO2 × p × V
-        # An_leaf = -------------------
-        #                  R × T
-        #
-        # where:
-        #   delta_CO2 = rate of CO2 change (ppm s-1)
-        #   p         = pressure (Pa)
-        #   V         = lunchbox_volume (m3)
-        #   R         = universal gas constant (J mol⁻¹ K⁻¹)
-        #   T         = temperature (K)
-
-        RGAS = 8.314 # J mol-1 K-1
-        volume_m3 = lunchbox_volume / 1000.0
-        an_leaf = (delta_ppm_s * pressure_pa * volume_m3) / (RGAS * temp_K)
-
-        return an_leaf # umol leaf-1 s-1
+        return _calc_anet(delta_ppm_s, temp_K, lunchbox_volume, pressure_pa)
 
     @staticmethod
     def compute_co2_dry(co2_wet_ppm, rh_percent, temp_c, pressure_pa):
-        es = LunchboxLogger.saturation_vapour_pressure(temp_c) * 1000 # Pa
-        ea = es * (rh_percent / 100.0) # Pa
-
-        return co2_wet_ppm / (1. - (ea / pressure_pa))
+        return _compute_co2_dry(co2_wet_ppm, rh_percent, temp_c, pressure_pa)
 
     @staticmethod
     def calc_vpd(temp_c, rh_percent):
-        es = LunchboxLogger.saturation_vapour_pressure(temp_c) # kPa
-        ea = es * (rh_percent / 100.0) # kPa
-
-        return es - ea  # kPa
+        return _calc_vpd(temp_c, rh_percent)
 
     @staticmethod
     def saturation_vapour_pressure(temp_c):
-        if temp_c >= 0.0:
-            # Monteith and Unsworth (2008) - Tetens' formula for temp > 0 deg C
-            p = 0.61078 * np.exp((17.27 * temp_c) / (temp_c + 237.3)) # kPa
-        else:
-            # Murray (1967) Tetens' formula for temp < 0 deg C
-            p = 0.61078 * np.exp((21.875 * temp_c) / (temp_c + 265.5)) # kPa
-
-        return p
+        return _saturation_vapour_pressure(temp_c)
 
     def _setup_sensor(self):
+        # imported here so the helpers in this module can be used (or the
+        # module imported) on a machine without the sensor stack
+        import qwiic_scd4x
+
         self.sensor = qwiic_scd4x.QwiicSCD4x()
         if not self.sensor.is_connected():
             raise RuntimeError("Sensor not connected")
@@ -287,19 +275,22 @@ class LunchboxLogger:
         print("Sensor ready. Use buttons to begin zero run or logging.")
 
     def _setup_plot(self):
-        plt.ion()
         self.fig, self.ax = plt.subplots()
         plt.subplots_adjust(bottom=0.4)
 
-        self.line, = self.ax.plot([], [], 'g-', label="A_net")
-        self.ci_fill = None
+        # the data artists are animated, i.e. left out of full redraws and
+        # blitted on top of them instead, see _on_draw
+        self.line, = self.ax.plot([], [], 'g-', label="A_net", animated=True)
+        self._ci_rgba = to_rgba('seagreen', alpha=0.3)
+        self.ci_fill = self.ax.fill_between([], [], [], color=self._ci_rgba,
+                                            animated=True)
         self.ci_filled_once = False
 
         self.ax2 = self.ax.twinx()
         self.temp_line, = self.ax2.plot([], [], '-', color="#377eb8",
-                                        label="Temp (°C)")
+                                        label="Temp (°C)", animated=True)
         self.rh_line, = self.ax2.plot([], [], '-', color="#ff7f00",
-                                      label="RH (%)")
+                                      label="RH (%)", animated=True)
 
         self.ax.set_xlabel("Time (min)")
         self.ax.set_ylabel("Net Photosynthesis (μmol m⁻² s⁻¹)")
@@ -308,6 +299,14 @@ class LunchboxLogger:
         self.ax2.set_ylabel("Temp (°C) / RH (%)")
         self.ax2.set_ylim(0, 100)
 
+        # artists that change with each sample, these get blitted over a
+        # cached background of the axes
+        self._data_artists = [self.ci_fill, self.line, self.temp_line,
+                              self.rh_line]
+        self._bg = None
+        self._limits = None
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+
         self.status_text = self.fig.text(0.5, 0.03, "Status: Idle", ha="center")
 
         ax_zero = plt.axes([0.05, 0.15, 0.25, 0.075])
@@ -327,6 +326,48 @@ class LunchboxLogger:
         self.text_box = TextBox(ax_text, "", initial=str(self.leaf_area_cm2[0]))
         self.text_box.on_submit(self.update_leaf_area)
 
+    def _resum_window(self):
+        # re-sum from the ring once per lap so rounding errors from the
+        # running updates can't accumulate
+        t = self.ring[:, RING_TIME]
+        y = self.ring[:, self._y_col]
+        self._s_t = t.sum()
+        self._s_tt = t @ t
+        self._s_y = y.sum()
+        self._s_ty = t @ y
+        self._s_yy = y @ y
+
+    def _reset_zero_sums(self):
+        self._zero_t0 = None
+        self._zero_n = 0
+        self._zero_s_t = self._zero_s_tt = 0.0
+        self._zero_s_y = self._zero_s_ty = self._zero_s_yy = 0.0
+
+    def _log(self, msg):
+        # called from the sensor thread, see _flush_log
+        self._log_lines.append(msg)
+
+    def _flush_log(self):
+        # everything queued since the last tick in one write, popleft is
+        # atomic so the sensor thread can keep appending meanwhile
+        lines = self._log_lines
+        if lines:
+            out = []
+            while lines:
+                out.append(lines.popleft())
+            sys.stdout.write("\n".join(out) + "\n")
+
+    def _on_draw(self, event):
+        # any full draw (first show, resize, new limits, status text) leaves
+        # out the animated data artists, so keep a copy of the axes area as
+        # the background to restore and then draw them back on top
+        self._bg = self.fig.canvas.copy_from_bbox(self.ax.bbox)
+        self._draw_data_artists()
+
+    def _draw_data_artists(self):
+        for artist in self._data_artists:
+            artist.axes.draw_artist(artist)
+
     def update_leaf_area(self, text):
         try:
             value = float(text)
@@ -334,6 +375,7 @@ class LunchboxLogger:
                 raise ValueError
             with self.lock:
                 self.leaf_area_cm2[0] = value
+                self.leaf_area_m2 = value / 10000.0
             print(f"Leaf area set to {value:.1f} cm²")
         except ValueError:
             print("Invalid input. Please enter a positive number.")
@@ -343,88 +385,181 @@ class LunchboxLogger:
             if self.zero_run_started:
                 print("Zero run already in progress.")
                 return
-            if self.logging_started:
+            if self.logging_started.is_set():
                 print("Stop logging before starting zero run.")
                 return
             self.zero_run_started = True
-            self.zero_data_times.clear()
-            self.zero_data_co2.clear()
+            self._reset_zero_sums()
         print("\nStarting zero calibration.")
         self.status_text.set_text("Status: Zero calibration running...")
-        plt.draw()
+        self._dirty = True
 
     def start_logging(self, event):
         with self.lock:
-            if self.logging_started:
+            if self.logging_started.is_set():
                 print("Logging already in progress.")
                 return
             if self.zero_run_started:
                 print("Wait for zero calibration to finish before logging.")
                 return
-            self.logging_started = True
+            self.logging_started.set()
         print(f"\nLogging started. Leaf area = {self.leaf_area_cm2[0]:.1f} cm²")
         self.status_text.set_text(
             f"  Status: Logging... ")
-        plt.draw()
+        self._dirty = True
 
     def stop_logging(self, event):
         print("\nStop button pressed. Exiting...")
-        with self.lock:
-            self.stop_requested = True
+        self.stop_requested.set()
         self.status_text.set_text("Status: Stopped by user")
-        plt.draw()
+        self._dirty = True
+
+    def _read_sample(self):
+        # read_measurement() fetches CO2, T and RH from the SCD4x in a single
+        # I2C read and caches them, the getters only hand back those cached
+        # values, so this is one measurement read per sample and all three
+        # come from the same measurement. It checks the data-ready status
+        # itself and returns False when nothing new is ready, the callers
+        # then wait SENSOR_POLL and ask again
+        if not self.sensor.read_measurement():
+            return None
+        return (self.sensor.get_co2(), self.sensor.get_temperature(),
+                self.sensor.get_humidity())
+
+    def _store_anet(self, now, temp, rh):
+        # Fit the window and append an A_net point, run by the sensor thread
+        # as each sample goes in so the GUI tick only has to plot
+
+        DEG_2_K = 273.15
+
+        with self.lock:
+            sums = (self._n, self._s_t, self._s_tt, self._s_y,
+                    self._s_ty, self._s_yy)
+            zero_slope = self.zero_slope
+            leaf_area_m2 = self.leaf_area_m2
+
+        if sums[0] < self.window_size:
+            return
+
+        slope, stderr = calc_slope_stderr(*sums)
+
+        corr_slope = slope - zero_slope
+        half = 1.96 * stderr
+
+        temp_K = temp + DEG_2_K
+
+        # the conversion (_calc_anet, via _flux_const) is linear in the
+        # slope, so the CI bounds are A_net -/+ the converted half width
+        scale = -self._flux_const / (temp_K * leaf_area_m2)
+
+        A_net = scale * corr_slope
+        A_net_u = A_net + scale * half
+        A_net_l = A_net - scale * half
+
+        if not self.quiet and now - self.last_anet_print_time > 5:
+            self._log(
+                f"ΔCO₂: {corr_slope:+.4f} ± {half:.4f} | "
+                f"A_net: {A_net:+.2f}\n" + "-" * 40
+            )
+            self.last_anet_print_time = now
+
+        # A_net times are kept in minutes since the first point, so the plot
+        # only needs a subtraction
+        if self.start_time is None:
+            self.start_time = now
+        now_min = (now - self.start_time) / 60.0
+
+        # the ring stays in time order, so when it is full shift it down one
+        # slot (a ~240 column memmove every 5 s) and the plot can use plain
+        # slices of it
+        ring = self.anet_ring
+        evicted = None
+        with self.lock:
+            if self.anet_count == ring.shape[1]:
+                evicted = ring[ANET_VALUE, 0]
+                ring[:, :-1] = ring[:, 1:]
+                self.anet_count -= 1
+            ring[:, self.anet_count] = (now_min, A_net, A_net_u, A_net_l,
+                                        temp, rh)
+            # compare extrema in the stored (float32) precision
+            stored = ring[ANET_VALUE, self.anet_count]
+            self.anet_count += 1
+            n_anet = self.anet_count
+
+            # running A_net extrema for the y limits, only rescan when the
+            # point that dropped off was one of them
+            if (evicted == self._ymin_running or
+                    evicted == self._ymax_running):
+                self._ymin_running = ring[ANET_VALUE, :n_anet].min()
+                self._ymax_running = ring[ANET_VALUE, :n_anet].max()
+            else:
+                self._ymin_running = min(self._ymin_running, stored)
+                self._ymax_running = max(self._ymax_running, stored)
+            self._sensor_version += 1
 
     def sensor_thread(self):
-        while True:
+        # waits are on the stop event rather than time.sleep, so pressing
+        # Stop or closing the window wakes the thread straight away
+        stop = self.stop_requested
+        while not stop.is_set():
+            wait = self._last_sample_time + SENSOR_PERIOD - time.monotonic()
+            if wait > 0 and stop.wait(wait):
+                break
+
             with self.lock:
-                if self.stop_requested:
-                    break
                 zero_run = self.zero_run_started
-                logging = self.logging_started
+            logging = self.logging_started.is_set()
             if zero_run:
-                if self.sensor.read_measurement():
-                    co2 = self.sensor.get_co2()
-                    temp = self.sensor.get_temperature()
-                    rh = max(0, min(100, self.sensor.get_humidity()))
-                    co2_dry = self.compute_co2_dry(co2, rh, temp,
-                                                   self.pressure_pa)
-                    now = time.time()
+                sample = self._read_sample()
+                if sample is not None:
+                    co2, temp, rh = sample
+                    rh = max(0, min(100, rh))
+                    co2_dry = _compute_co2_dry(co2, rh, temp,
+                                               self.pressure_pa)
+                    now = time.monotonic()
+                    self._last_sample_time = now
 
                     with self.lock:
-                        self.zero_data_times.append(now)
-                        self.zero_data_co2.append(co2_dry)
-
-                    elapsed = now - self.zero_data_times[0]
+                        if self._zero_t0 is None:
+                            self._zero_t0 = now
+                        t = now - self._zero_t0
+                        self._zero_n += 1
+                        self._zero_s_t += t
+                        self._zero_s_tt += t * t
+                        self._zero_s_y += co2_dry
+                        self._zero_s_ty += t * co2_dry
+                        self._zero_s_yy += co2_dry * co2_dry
+
+                    elapsed = now - self._zero_t0
                     self.zero_status_dots = (self.zero_status_dots + 1) % 4
                     dots = '.' * self.zero_status_dots
-                    self.status_text.set_text(f"Status: Zero run running{dots}")
-                    plt.draw()
-
-                    now_print = time.time()
                     with self.lock:
-                        last_print = getattr(self, '_last_zero_print', 0)
-                    if now_print - last_print > 1.0:
-                        print(f"Zero run running{dots}")
-                        with self.lock:
-                            self._last_zero_print = now_print
+                        self._pending_status = (
+                            f"Status: Zero run running{dots}")
+
+                    # only this thread touches _last_zero_print, no lock
+                    last_print = self._last_zero_print
+                    if not self.quiet and now - last_print > 1.0:
+                        self._log(f"Zero run running{dots}")
+                        self._last_zero_print = now
 
                     if elapsed >= self.zero_run_duration:
                         enough_data = False
                         with self.lock:
-                            if len(self.zero_data_co2) < self.window_size:
-                                print(
-                                    f"Only {len(self.zero_data_co2)} zero "
+                            if self._zero_n < self.window_size:
+                                self._log(
+                                    f"Only {self._zero_n} zero "
                                     "points. Waiting for more..."
                                 )
                                 self.zero_run_duration += 6
                                 enough_data = False
                             else:
-                                times_np = np.array(self.zero_data_times)
-                                co2_np = np.array(self.zero_data_co2)
-                                slope, _ = np.polyfit(times_np - times_np[0],
-                                                        co2_np, 1)
+                                slope, _ = calc_slope_stderr(
+                                    self._zero_n, self._zero_s_t,
+                                    self._zero_s_tt, self._zero_s_y,
+                                    self._zero_s_ty, self._zero_s_yy)
                                 if abs(slope) > 0.05:
-                                    print(
+                                    self._log(
                                         "Warning: large zero slope = "
                                         f"{slope:.8f}, "
                                         "ignoring correction."
@@ -434,58 +569,161 @@ class LunchboxLogger:
                                     self.zero_run_duration += 6
                                     continue
                                 else:
-                                    print(f"Zero slope accepted = {slope:.8f}")
+                                    self._log(
+                                        f"Zero slope accepted = {slope:.8f}")
                                     self.zero_slope = slope
 
-                                print(
+                                self._log(
                                         f"Final zero slope correction: "
                                         f"{self.zero_slope:.8f} ppm s-1"
                                 )
-                                self.zero_data_times.clear()
-                                self.zero_data_co2.clear()
+                                self._reset_zero_sums()
                                 self.zero_run_started = False
-                                self.status_text.set_text("Status: Zero run \
-                                                            complete")
-                                plt.draw()
+                                self._pending_status = (
+                                    "Status: Zero run complete")
                                 enough_data = True
 
                         if not enough_data:
-                            time.sleep(6.0)
                             continue
-
+                else:
+                    stop.wait(SENSOR_POLL)
 
             if logging:
-                if self.sensor.read_measurement():
-                    co2 = self.sensor.get_co2()
-                    temp = self.sensor.get_temperature()
-                    rh = self.sensor.get_humidity()
-                    vpd = self.calc_vpd(temp, rh)
-                    co2_dry = self.compute_co2_dry(co2, rh, temp,
-                                                   self.pressure_pa)
-                    now = time.time()
+                sample = self._read_sample()
+                if sample is not None:
+                    co2, temp, rh = sample
+                    co2_dry = _compute_co2_dry(co2, rh, temp,
+                                               self.pressure_pa)
+                    now = time.monotonic()
+                    self._last_sample_time = now
 
                     with self.lock:
                         idx = self.window_index
-                        self.co2_window[idx] = co2          # store wet CO2
-                        self.dry_co2_window[idx] = co2_dry  # store dry CO2
-                        self.time_window[idx] = now
-                        self.temp_values[idx] = temp
-                        self.rh_values[idx] = rh
+                        if self._t0 is None:
+                            self._t0 = now
+                        t = now - self._t0
+                        y = co2 if self.no_dry_correction else co2_dry
+
+                        # swap the sample we overwrite out of the sums
+                        if self.window_filled:
+                            t_old = self.ring[idx, RING_TIME]
+                            y_old = self.ring[idx, self._y_col]
+                            self._s_t -= t_old
+                            self._s_tt -= t_old * t_old
+                            self._s_y -= y_old
+                            self._s_ty -= t_old * y_old
+                            self._s_yy -= y_old * y_old
+                        else:
+                            self._n += 1
+                        self._s_t += t
+                        self._s_tt += t * t
+                        self._s_y += y
+                        self._s_ty += t * y
+                        self._s_yy += y * y
+
+                        self.ring[idx] = (t, co2, co2_dry, temp, rh)
 
                         self.window_index = (idx + 1) % self.window_size
                         if self.window_index == 0:
                             self.window_filled = True
+                            self._resum_window()
+
+                    self._store_anet(now, temp, rh)
 
-                        print(
+                    if not self.quiet and now - self._last_log_print > 5:
+                        vpd = _calc_vpd(temp, rh)
+                        self._log(
                             f"CO₂: {co2_dry:.1f} | "
                             f"T: {temp:.1f} °C | RH: {rh:.1f} % | "
                             f"VPD: {vpd:.1f} kPa"
                         )
+                        self._last_log_print = now
                 else:
-                    time.sleep(6.0)
-            else:
-                time.sleep(0.5)
+                    stop.wait(SENSOR_POLL)
+            elif not zero_run:
+                stop.wait(0.5)
+
+
+# the explicit float64 signatures make numba compile these helpers when the
+# module is imported, so the sensor thread doesn't pay for it on its first read
+@njit("float64(float64, float64, float64, float64)", cache=True,
+      fastmath=True)
+def _calc_anet(delta_ppm_s, temp_K, lunchbox_volume, pressure_pa):
+    # Net assimilation rate (An_leaf, umol leaf-1 s-1) calculated using the
+    # ideal gas law to solve for "n" amount of substance, moles of gas
+    # i.e, converts ppm s-1 into umol s-1
+    #
+    #            delta_CO2 × p × V
+    # An_leaf = -------------------
+    #                  R × T
+    #
+    # where:
+    #   delta_CO2 = rate of CO2 change (ppm s-1)
+    #   p         = pressure (Pa)
+    #   V         = lunchbox_volume (m3)
+    #   R         = universal gas constant (J mol⁻¹ K⁻¹)
+    #   T         = temperature (K)
+
+    RGAS = 8.314 # J mol-1 K-1
+    volume_m3 = lunchbox_volume / 1000.0
+    an_leaf = (delta_ppm_s * pressure_pa * volume_m3) / (RGAS * temp_K)
+
+    return an_leaf # umol leaf-1 s-1
+
+# Tetens' formula over 0-50 deg C, which covers anything the lunchbox
+# should see, as a degree 6 polynomial fitted offline (Chebyshev fit,
+# max relative error < 1e-5), so the sensor thread doesn't call exp
+_SVP_C0 = 6.107753328e-01
+_SVP_C1 = 4.445593961e-02
+_SVP_C2 = 1.428813586e-03
+_SVP_C3 = 2.654345410e-05
+_SVP_C4 = 2.929372385e-07
+_SVP_C5 = 2.273987156e-09
+_SVP_C6 = 4.566008906e-12
+_SVP_TMAX = 50.0
+
+@njit("float64(float64)", cache=True, fastmath=True)
+def _saturation_vapour_pressure(temp_c):
+    if 0.0 <= temp_c < _SVP_TMAX:
+        t = temp_c
+        p = (((((_SVP_C6 * t + _SVP_C5) * t + _SVP_C4) * t + _SVP_C3) * t +
+              _SVP_C2) * t + _SVP_C1) * t + _SVP_C0 # kPa
+    elif temp_c >= 0.0:
+        # Monteith and Unsworth (2008) - Tetens' formula for temp > 0 deg C
+        p = 0.61078 * math.exp((17.27 * temp_c) / (temp_c + 237.3)) # kPa
+    else:
+        # Murray (1967) Tetens' formula for temp < 0 deg C
+        p = 0.61078 * math.exp((21.875 * temp_c) / (temp_c + 265.5)) # kPa
+
+    return p
+
+@njit("float64(float64, float64, float64, float64)", cache=True,
+      fastmath=True)
+def _compute_co2_dry(co2_wet_ppm, rh_percent, temp_c, pressure_pa):
+    es = _saturation_vapour_pressure(temp_c) * 1000 # Pa
+    ea = es * (rh_percent / 100.0) # Pa
+
+    return co2_wet_ppm / (1. - (ea / pressure_pa))
+
+@njit("float64(float64, float64)", cache=True, fastmath=True)
+def _calc_vpd(temp_c, rh_percent):
+    es = _saturation_vapour_pressure(temp_c) # kPa
+    ea = es * (rh_percent / 100.0) # kPa
 
+    return es - ea  # kPa
+
+def calc_slope_stderr(n, s_t, s_tt, s_y, s_ty, s_yy):
+    # Least-squares slope and its standard error, i.e. the two numbers we
+    # used from scipy's linregress, from the running sums of t, t², y, ty
+    # and y² so no arrays are needed
+    sxx = s_tt - s_t * s_t / n
+    sxy = s_ty - s_t * s_y / n
+    syy = s_yy - s_y * s_y / n
+    slope = sxy / sxx
+    sse = max(syy - slope * sxy, 0.0)
+    stderr = math.sqrt(sse / ((n - 2) * sxx))
+
+    return slope, stderr
 
 def calc_volume_litres(width_cm, height_cm, length_cm):
 
@@ -494,8 +732,7 @@ def calc_volume_litres(width_cm, height_cm, length_cm):
     return volume_litres
 
 
-if __name__ == "__main__":
-
+def main():
     import argparse
 
     parser = argparse.ArgumentParser()
@@ -505,6 +742,8 @@ if __name__ == "__main__":
                         help='Turn off volume correction for plant in pot')
     parser.add_argument('--no_dry_correction', action='store_true',
                         help='Disable dry CO2 correction (use raw CO2)')
+    parser.add_argument('--quiet', action='store_true',
+                        help='Do not print each reading to the terminal')
     args = parser.parse_args()
     la = args.leaf_area if args.leaf_area and args.leaf_area > 0 else 23.0
 
@@ -519,5 +758,11 @@ if __name__ == "__main__":
     logger = LunchboxLogger(lunchbox_volume=lunchbox_volume, window_size=12,
                             plot_window=1200, zero_run_duration=30,
                             leaf_area_cm2_init=la,
-                            no_dry_correction=args.no_dry_correction)
+                            no_dry_correction=args.no_dry_correction,
+                            quiet=args.quiet)
     logger.run()
+
+
+if __name__ == "__main__":
+
+    main()
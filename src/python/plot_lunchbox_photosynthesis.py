@@ -8,6 +8,8 @@ if sys.platform.startswith("win"):
     except ImportError:
         matplotlib.use("TkAgg")  # fallback on Windows if Qt isn't available
 
+from collections import deque
+import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.animation as animation
 from lunchbox_logger import LunchboxLogger
@@ -52,7 +54,11 @@ def run_plotter(temp=20.0, no_plant_pot=False, leaf_area=25.0, window_size=41,
 
     max_len = int(plot_duration_min * 60 / measure_interval)
 
-    xs, ys_anet, ys_lower, ys_upper = [], [], [], []
+    # bounded, so the oldest point drops off on append
+    xs = deque(maxlen=max_len)
+    ys_anet = deque(maxlen=max_len)
+    ys_lower = deque(maxlen=max_len)
+    ys_upper = deque(maxlen=max_len)
 
     fig, ax = plt.subplots(figsize=(12, 6))
     ax.set_xlabel("Elapsed Time (min)")
@@ -62,12 +68,17 @@ def run_plotter(temp=20.0, no_plant_pot=False, leaf_area=25.0, window_size=41,
     ax.axhline(y=0.0, color="darkgrey", linestyle="--")
 
     line_anet, = ax.plot([], [], lw=2, color="#28b463", label="Anet")
-    fill_between = None
+    # one CI band for the whole run, update() just reshapes it
+    fill_between = ax.fill_between([], [], [], color="#0b5345", alpha=0.2,
+                                   label="95% CI")
+    lines = [line_anet, fill_between]
+    labels = [line.get_label() for line in lines if \
+                    line.get_label() != "_nolegend_"]
+    ax.legend(lines, labels, loc="lower right")
     co2_text = ax.text(0.02, 0.95, "", transform=ax.transAxes, fontsize=12,
                        verticalalignment="top", color="#8e44ad",)
 
     def update(frame):
-        nonlocal fill_between
         data = logger.read_and_update()
         if data is None:
             return line_anet, co2_text
@@ -83,27 +94,25 @@ def run_plotter(temp=20.0, no_plant_pot=False, leaf_area=25.0, window_size=41,
         ys_lower.append(anet_l)
         ys_upper.append(anet_u)
 
-        # Keep lists at max_len
-        if len(xs) > max_len:
-            xs.pop(0)
-            ys_anet.pop(0)
-            ys_lower.pop(0)
-            ys_upper.pop(0)
-
         co2_text.set_text(f"CO₂ = {co2:.0f} ppm | A_net = {anet:+.2f} {units}")
 
         # Update x-axis limits for moving window
-        ax.set_xlim(max(0, elapsed_min - plot_duration_min), elapsed_min)
+        x_min = max(0, elapsed_min - plot_duration_min)
+        ax.set_xlim(x_min, elapsed_min)
+
+        # one array per series, shared by the y limits and the CI band
+        x = np.asarray(xs)
+        y_lower = np.asarray(ys_lower)
+        y_upper = np.asarray(ys_upper)
+        y_anet = np.asarray(ys_anet)
 
         if auto_ylim:
-            visible_lower = [y for x, y in zip(xs, ys_lower) \
-                                if x >= max(0, elapsed_min - plot_duration_min)]
-            visible_upper = [y for x, y in zip(xs, ys_upper) \
-                                if x >= max(0, elapsed_min - plot_duration_min)]
-
-            if visible_lower and visible_upper:
-                anet_min = min(visible_lower)
-                anet_max = max(visible_upper)
+            # the times are in order, so the visible part is a tail
+            first = np.searchsorted(x, x_min)
+
+            if first < len(x):
+                anet_min = y_lower[first:].min()
+                anet_max = y_upper[first:].max()
                 anet_range = anet_max - anet_min
 
                 if anet_range < 1.0:
@@ -122,19 +131,11 @@ def run_plotter(temp=20.0, no_plant_pot=False, leaf_area=25.0, window_size=41,
         else:
             ax.set_ylim(-5, 8)
 
-        line_anet.set_data(xs, ys_anet)
-
-        if fill_between:
-            fill_between.remove()
-
-        fill_between = ax.fill_between(xs, ys_lower, ys_upper, color="#0b5345",
-                                       alpha=0.2, label="95% CI")
+        line_anet.set_data(x, y_anet)
 
-        # Update legend
-        lines = [line_anet, fill_between]
-        labels = [line.get_label() for line in lines if \
-                        line.get_label() != "_nolegend_"]
-        ax.legend(lines, labels, loc="lower right")
+        verts = np.column_stack([np.concatenate([x, x[::-1]]),
+                                 np.concatenate([y_lower, y_upper[::-1]])])
+        fill_between.set_verts([verts])
 
         return line_anet, co2_text, fill_between
 